@@ -6,44 +6,240 @@ Admin Approval Authentication System
 """
 
 import streamlit as st
-from supabase import create_client, Client
-from datetime import datetime
+from datetime import datetime, timezone
+from concurrent.futures import Future, ThreadPoolExecutor
 import hashlib
+import hmac
+import os
+import queue
 import re
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import string
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING
+
+from app_config import get_secret
+
+# Optional: per-browser device id kept in localStorage
+try:
+    from streamlit_js_eval import streamlit_js_eval
+    JS_EVAL_AVAILABLE = True
+except ImportError:
+    JS_EVAL_AVAILABLE = False
+    # Not silent: without it every session gets a throwaway id and each login needs device approval
+    print("Warning: streamlit_js_eval is not installed - device ids will not persist across sessions")
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+
+# scrypt cost parameters for new password hashes (each stored hash records its own)
+_SCRYPT_N = 2 ** 14
+_SCRYPT_R = 8
+_SCRYPT_P = 1
+_SCRYPT_DKLEN = 32
+
+# Verified against when the email is unknown, so that path costs the same scrypt
+# run as a wrong password (never matches: no password derives an all-zero key)
+_DUMMY_HASH = f"scrypt${_SCRYPT_N}${_SCRYPT_R}${_SCRYPT_P}${'00' * 16}${'00' * _SCRYPT_DKLEN}"
+
+# Seconds before a REST/RPC call to Supabase is abandoned (supabase-py's default;
+# a stalled login holds a Streamlit script thread this long)
+_POSTGREST_TIMEOUT = 5
+
+# Reads the browser's device id, storing the session's candidate id on first visit
+_DEVICE_ID_JS = (
+    "localStorage.getItem('device_id') || "
+    "(localStorage.setItem('device_id', '%s'), localStorage.getItem('device_id'))"
+)
+
+# Reruns to wait for the browser's answer before settling for the session's candidate id
+# (localStorage blocked, component failed to load, strict privacy mode)
+_DEVICE_ID_MAX_WAITS = 2
+
+# \Z, not $: $ would also accept a trailing newline
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\Z')
+
+# Admin notification bodies (parsed once at import)
+# $..._sql placeholders take _sql_literal() values - the device id comes from the browser
+_SIGNUP_REQUEST_TEMPLATE = string.Template("""
+🔔 NEW USER SIGNUP REQUEST
+
+Name: $user_name
+Email: $user_email
+Date: $ts
+
+ACTION REQUIRED:
+1. Go to Supabase Dashboard
+2. Open 'users' table
+3. Find user: $user_email
+4. Set 'is_approved' = TRUE
+5. Add first device to 'approved_devices': []
+
+Or use SQL:
+UPDATE users 
+SET is_approved = true, 
+    approved_at = NOW(), 
+    approved_by = $admin_email_sql,
+    approved_devices = ARRAY[$device_id_sql]::text[]
+WHERE email = $user_email_sql;
+
+---
+AI Resume Shortlisting System
+""")
+
+_DEVICE_ALERT_TEMPLATE = string.Template("""
+🔐 NEW DEVICE LOGIN ATTEMPT
+
+User: $user_name ($user_email)
+Device ID: $device_id
+Date: $ts
+
+ACTION REQUIRED:
+Approve this device by running SQL:
+
+SELECT approve_device($user_email_sql, $device_id_sql);
+
+---
+AI Resume Shortlisting System
+""")
+
+
+def _sql_literal(value: str) -> str:
+    """Quote a value as a Postgres string literal for the copy-paste SQL in admin messages"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+@st.cache_resource
+def _get_supabase(url: str, key: str) -> "Client":
+    """Shared Supabase client - built once per server process"""
+    # Imported here so loading this module doesn't pull in the full supabase tree
+    from supabase import create_client
+    from supabase.lib.client_options import ClientOptions
+    
+    return create_client(url, key, options=ClientOptions(postgrest_client_timeout=_POSTGREST_TIMEOUT))
+
+
+@st.cache_resource
+def _get_background_executor() -> ThreadPoolExecutor:
+    """Background workers for admin notifications and bookkeeping writes - keeps them off the request thread"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="auth-background")
+
+
+def _log_background_failure(future: Future):
+    """Done-callback: report exceptions that would otherwise vanish with the discarded future"""
+    exc = future.exception()
+    if exc is not None:
+        print(f"Background auth task failed: {exc!r}")
+
+
+def _submit_background(fn, *args):
+    """Run fn(*args) on the background executor, logging it if it raises"""
+    _get_background_executor().submit(fn, *args).add_done_callback(_log_background_failure)
+
+
+class ActivityLogWriter:
+    """Buffers activity_logs rows and writes them as one bulk insert from a daemon thread"""
+    
+    FLUSH_INTERVAL = 2.0  # seconds to wait for more rows after the first one
+    MAX_BATCH = 50
+    
+    def __init__(self, client: "Client"):
+        self.client = client
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+        self._thread.start()
+    
+    def log(self, entry: dict):
+        """Queue a row for the next batch (never blocks on the network)"""
+        self._queue.put(entry)
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            
+            while len(batch) < self.MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._flush(batch)
+    
+    def _flush(self, batch: list):
+        """Insert batch in one request, retrying once before dropping it"""
+        try:
+            self.client.table('activity_logs').insert(batch).execute()
+            return
+        except Exception:
+            time.sleep(self.FLUSH_INTERVAL)
+        
+        try:
+            self.client.table('activity_logs').insert(batch).execute()
+        except Exception as e:
+            print(f"Failed to write {len(batch)} activity log(s): {e}")
+
+
+@st.cache_resource
+def _get_activity_log_writer(url: str, key: str) -> ActivityLogWriter:
+    """Shared activity log writer - one background thread per server process"""
+    return ActivityLogWriter(_get_supabase(url, key))
 
 
 class AdminApprovalAuth:
     """Authentication with admin approval and device verification"""
     
-    def _init_(self):
+    __slots__ = ('url', 'key', 'client', 'activity_log', 'admin_email')
+    
+    def __init__(self):
         # Supabase connection
-        self.url = st.secrets.get("SUPABASE_URL", "")
-        self.key = st.secrets.get("SUPABASE_KEY", "")
+        self.url = get_secret("SUPABASE_URL", "")
+        self.key = get_secret("SUPABASE_KEY", "")
         
         if self.url and self.key:
-            self.client: Client = create_client(self.url, self.key)
+            self.client = _get_supabase(self.url, self.key)
+            self.activity_log = _get_activity_log_writer(self.url, self.key)
         else:
             self.client = None
+            self.activity_log = None
         
         # Admin email (YOU)
-        self.admin_email = st.secrets.get("ADMIN_EMAIL", "your-admin@email.com")
-        
-        # Session state initialization
-        if 'user' not in st.session_state:
-            st.session_state.user = None
-        if 'device_id' not in st.session_state:
-            st.session_state.device_id = self._generate_device_id()
+        self.admin_email = get_secret("ADMIN_EMAIL", "your-admin@email.com")
+    
+    def init_session_state(self):
+        """Initialize per-session state (instance itself is shared across sessions)"""
+        ss = st.session_state
+        if 'user' not in ss:
+            ss.user = None
+        if ss.get('device_id') is None:
+            ss.device_id = self._generate_device_id()
     
-    def _generate_device_id(self) -> str:
-        """Generate unique device identifier"""
-        import platform
-        import socket
+    def _generate_device_id(self):
+        """
+        Get a stable per-browser identifier from localStorage
+        
+        Returns None until the browser has answered (the component triggers a rerun).
+        If it never answers, or streamlit_js_eval is missing, uses the session's random
+        candidate id - unique to this session, never shared between browsers.
+        """
+        ss = st.session_state
+        # Fixed per session so the JS expression (and component) stays stable across reruns
+        candidate = ss.setdefault('device_id_candidate', uuid.uuid4().hex)
+        if not JS_EVAL_AVAILABLE:
+            return candidate
         
-        device_info = f"{platform.system()}-{platform.node()}-{socket.gethostname()}"
-        return hashlib.md5(device_info.encode()).hexdigest()
+        device_id = streamlit_js_eval(js_expressions=_DEVICE_ID_JS % candidate, key='device_id_js')
+        if device_id is None:
+            ss.device_id_waits = ss.get('device_id_waits', 0) + 1
+            if ss.device_id_waits > _DEVICE_ID_MAX_WAITS:
+                print("Warning: browser did not return a device id - using a per-session id")
+                return candidate
+        return device_id
     
     def sign_up(self, email: str, password: str, full_name: str) -> tuple:
         """
@@ -53,9 +249,13 @@ class AdminApprovalAuth:
         if not self.client:
             return False, "Authentication not configured"
         
+        # Normalize once, reuse everywhere below
+        email = email.strip().lower()
+        full_name = full_name.strip() if full_name else ""
+        
         try:
             # Validate inputs
-            if not full_name or full_name.strip() == "":
+            if not full_name:
                 return False, "Please enter your full name"
             
             if not self._validate_email(email):
@@ -64,33 +264,39 @@ class AdminApprovalAuth:
             if not self._validate_password(password):
                 return False, "Password must be at least 8 characters with letters and numbers"
             
-            # Hash password
-            hashed_password = hashlib.sha256(password.encode()).hexdigest()
+            # The admin's approval SQL whitelists this id - never send a placeholder
+            current_device = st.session_state.device_id
+            if current_device is None:
+                return False, "⏳ Still identifying this device. Please try again in a moment."
+            
+            # Hash password (salted scrypt)
+            hashed_password = self._hash_password(password)
             
             # Create user record (NOT approved by default)
+            # approved_at / approved_by / last_login start out NULL; signup_date defaults to now()
             user_data = {
-                'email': email.lower(),
+                'email': email,
                 'password_hash': hashed_password,
-                'full_name': full_name.strip(),
+                'full_name': full_name,
                 'is_approved': False,  # ← Admin approval required
-                'approved_at': None,
-                'approved_by': None,
-                'approved_devices': [],  # List of approved device IDs
-                'signup_date': datetime.now().isoformat(),
-                'last_login': None
+                'approved_devices': []  # List of approved device IDs
             }
             
-            # Check if user already exists
-            existing = self.client.table('users').select('email').eq('email', email.lower()).execute()
-            if existing.data:
-                return False, "Email already registered. Waiting for admin approval."
-            
-            # Insert new user
-            response = self.client.table('users').insert(user_data).execute()
+            # Insert new user - users_email_lower_idx rejects duplicates (see admin_approval_schema.sql)
+            # (postgrest is already loaded by the client; imported here to keep module import light)
+            from postgrest.exceptions import APIError
+            try:
+                response = self.client.table('users').insert(user_data).execute()
+            except APIError as e:
+                if e.code == '23505':  # unique_violation
+                    return False, "Email already registered. Waiting for admin approval."
+                raise
             
             if response.data:
-                # Send email to admin for approval
-                self._send_approval_request_to_admin(email, full_name)
+                # Notify admin in the background (session state is read above, not in the worker)
+                _submit_background(
+                    self._send_approval_request_to_admin, email, full_name, current_device
+                )
                 
                 return True, f"✅ Account created for {full_name}!\n\n⏳ Your account is pending admin approval. You'll receive an email once approved."
             else:
@@ -106,29 +312,44 @@ class AdminApprovalAuth:
         if not self.client:
             return False, "Authentication not configured"
         
+        email = email.strip().lower()
+        
+        # Malformed email can never match an account - skip the DB round-trip
+        if not self._validate_email(email):
+            return False, "❌ Invalid email or password"
+        
+        # Device id comes from the browser asynchronously (see _generate_device_id)
+        current_device = st.session_state.device_id
+        if current_device is None:
+            return False, "⏳ Still identifying this device. Please try again in a moment."
+        
         try:
-            # Hash password
-            hashed_password = hashlib.sha256(password.encode()).hexdigest()
-            
-            # Check user exists and credentials match
-            response = self.client.table('users').select('*').eq('email', email.lower()).eq('password_hash', hashed_password).execute()
+            # One round-trip: user row + server-side device check (see admin_approval_schema.sql).
+            # Looked up by email only - the salt lives in the stored hash.
+            response = self.client.rpc('auth_lookup', {
+                'p_email': email,
+                'p_device': current_device
+            }).execute()
             
             if not response.data:
+                self._verify_password(password, _DUMMY_HASH)  # don't reveal unknown emails by timing
                 return False, "❌ Invalid email or password"
             
             user = response.data[0]
             
+            if not self._verify_password(password, user.get('password_hash') or ''):
+                return False, "❌ Invalid email or password"
+            
             # CHECK 1: Is user approved by admin?
             if not user.get('is_approved', False):
                 return False, "⏳ Your account is pending admin approval.\n\nPlease wait for admin to approve your access."
             
             # CHECK 2: Is this device approved?
-            current_device = st.session_state.device_id
-            approved_devices = user.get('approved_devices', [])
-            
-            if current_device not in approved_devices:
+            if not user.get('device_approved', False):
                 # New device detected - Request admin approval
-                self._send_new_device_alert_to_admin(email, user['full_name'], current_device)
+                _submit_background(
+                    self._send_new_device_alert_to_admin, email, user['full_name'], current_device
+                )
                 
                 return False, f"🔐 New device detected!\n\nAdmin approval required for this device.\n\nAn email has been sent to the admin. Please wait for approval."
             
@@ -140,113 +361,88 @@ class AdminApprovalAuth:
                 'approved_at': user.get('approved_at')
             }
             
-            # Update last login
-            self.client.table('users').update({
-                'last_login': datetime.now().isoformat()
-            }).eq('id', user['id']).execute()
+            # Update last login (and upgrade legacy SHA-256 hashes in the same write)
+            login_update = {}
+            if not user.get('login_recent', False):  # skip if written within the last minute
+                login_update['last_login'] = datetime.now(timezone.utc).isoformat()
+            if not user['password_hash'].startswith('scrypt$'):
+                login_update['password_hash'] = self._hash_password(password)
+            
+            # Not needed for the response - write it in the background
+            if login_update:
+                _submit_background(self._record_login, user['id'], login_update)
             
             return True, f"✅ Welcome back, {user['full_name']}!"
         
         except Exception as e:
             return False, f"Login failed: {str(e)}"
     
-    def _send_approval_request_to_admin(self, user_email: str, user_name: str):
-        """Send email to admin when new user signs up"""
+    def _record_login(self, user_id, login_update: dict):
+        """Persist last_login (runs on the background executor)"""
         try:
-            # Create approval link (you'll manually approve in Supabase)
-            message = f"""
-🔔 NEW USER SIGNUP REQUEST
-
-Name: {user_name}
-Email: {user_email}
-Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-ACTION REQUIRED:
-1. Go to Supabase Dashboard
-2. Open 'users' table
-3. Find user: {user_email}
-4. Set 'is_approved' = TRUE
-5. Add first device to 'approved_devices': []
-
-Or use SQL:
-UPDATE users 
-SET is_approved = true, 
-    approved_at = NOW(), 
-    approved_by = '{self.admin_email}',
-    approved_devices = ARRAY['{st.session_state.device_id}']::text[]
-WHERE email = '{user_email}';
-
----
-AI Resume Shortlisting System
-"""
-            
-            # Log to activity_logs table
-            if self.client:
-                self.client.table('activity_logs').insert({
-                    'action_type': 'signup_request',
-                    'details': {
-                        'user_email': user_email,
-                        'user_name': user_name,
-                        'admin_notified': True
-                    },
-                    'created_at': datetime.now().isoformat()
-                }).execute()
-            
-            # Print for now (you can setup email later)
-            print(message)
-            
-            # TODO: Send actual email using SMTP
-            # self._send_email_to_admin(subject, message)
-            
+            self.client.table('users').update(login_update).eq('id', user_id).execute()
         except Exception as e:
-            print(f"Failed to send approval request: {e}")
+            print(f"Failed to record login: {e}")
+    
+    def _send_approval_request_to_admin(self, user_email: str, user_name: str, device_id: str):
+        """Send email to admin when new user signs up"""
+        now = datetime.now(timezone.utc)
+        message = _SIGNUP_REQUEST_TEMPLATE.substitute(
+            user_name=user_name,
+            user_email=user_email,
+            ts=now.strftime('%Y-%m-%d %H:%M:%S UTC'),
+            device_id=device_id,
+            user_email_sql=_sql_literal(user_email),
+            admin_email_sql=_sql_literal(self.admin_email),
+            device_id_sql=_sql_literal(device_id)
+        )
+        
+        self._notify_admin('signup_request', message, {
+            'user_email': user_email,
+            'user_name': user_name,
+            'admin_notified': True
+        })
     
     def _send_new_device_alert_to_admin(self, user_email: str, user_name: str, device_id: str):
         """Send alert when user tries to login from new device"""
+        now = datetime.now(timezone.utc)
+        message = _DEVICE_ALERT_TEMPLATE.substitute(
+            user_name=user_name,
+            user_email=user_email,
+            ts=now.strftime('%Y-%m-%d %H:%M:%S UTC'),
+            device_id=device_id,
+            user_email_sql=_sql_literal(user_email),
+            device_id_sql=_sql_literal(device_id)
+        )
+        
+        self._notify_admin('new_device_alert', message, {
+            'user_email': user_email,
+            'user_name': user_name,
+            'device_id': device_id,
+            'admin_notified': True
+        })
+    
+    def _notify_admin(self, action_type: str, message: str, details: dict):
+        """Log the request to activity_logs and deliver the message to admin"""
         try:
-            message = f"""
-🔐 NEW DEVICE LOGIN ATTEMPT
-
-User: {user_name} ({user_email})
-Device ID: {device_id}
-Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-ACTION REQUIRED:
-Approve this device by running SQL:
-
-UPDATE users 
-SET approved_devices = array_append(approved_devices, '{device_id}')
-WHERE email = '{user_email}';
-
----
-AI Resume Shortlisting System
-"""
-            
-            # Log to database
-            if self.client:
-                self.client.table('activity_logs').insert({
-                    'action_type': 'new_device_alert',
-                    'details': {
-                        'user_email': user_email,
-                        'user_name': user_name,
-                        'device_id': device_id,
-                        'admin_notified': True
-                    },
-                    'created_at': datetime.now().isoformat()
-                }).execute()
+            # Log to activity_logs table (batched by the background writer; created_at defaults to now())
+            if self.activity_log:
+                self.activity_log.log({
+                    'action_type': action_type,
+                    'details': details
+                })
             
+            # Print for now (you can setup email later)
             print(message)
             
-            # TODO: Send actual email
+            # TODO: Send actual email using SMTP
             
         except Exception as e:
-            print(f"Failed to send device alert: {e}")
+            print(f"Failed to notify admin ({action_type}): {e}")
     
     def sign_out(self):
         """Logout user"""
-        st.session_state.user = None
-        st.session_state.parsed_resumes = []
-        st.session_state.ranked_candidates = []
+        sign_out()
     
     def is_authenticated(self) -> bool:
         """Check if user is authenticated"""
@@ -256,39 +452,86 @@ AI Resume Shortlisting System
         """Get current authenticated user"""
         return st.session_state.user
     
-    def _validate_email(self, email: str) -> bool:
+    def _hash_password(self, password: str) -> str:
+        """Hash password with a random salt, encoded as scrypt$n$r$p$salt$hash"""
+        salt = os.urandom(16)
+        digest = hashlib.scrypt(password.encode(), salt=salt, n=_SCRYPT_N, r=_SCRYPT_R, p=_SCRYPT_P, dklen=_SCRYPT_DKLEN)
+        return f"scrypt${_SCRYPT_N}${_SCRYPT_R}${_SCRYPT_P}${salt.hex()}${digest.hex()}"
+    
+    def _verify_password(self, password: str, stored_hash: str) -> bool:
+        """Verify password against a stored hash in constant time"""
+        if stored_hash.startswith('scrypt$'):
+            _, n, r, p, salt, expected = stored_hash.split('$')
+            digest = hashlib.scrypt(
+                password.encode(), salt=bytes.fromhex(salt),
+                n=int(n), r=int(r), p=int(p), dklen=len(expected) // 2
+            )
+            return hmac.compare_digest(digest, bytes.fromhex(expected))
+        
+        # Legacy accounts: unsalted SHA-256 hex digest
+        try:
+            expected = bytes.fromhex(stored_hash)
+        except ValueError:
+            return False
+        return hmac.compare_digest(hashlib.sha256(password.encode()).digest(), expected)
+    
+    @staticmethod
+    def _validate_email(email: str) -> bool:
         """Validate email format"""
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(pattern, email) is not None
+        return _EMAIL_RE.match(email) is not None
     
-    def _validate_password(self, password: str) -> bool:
-        """Validate password strength"""
-        return (len(password) >= 8 and 
-                any(c.isalpha() for c in password) and 
-                any(c.isdigit() for c in password))
+    @staticmethod
+    def _validate_password(password: str) -> bool:
+        """Validate password strength (str.isalpha / str.isdigit, iterated in C via map)"""
+        return (len(password) >= 8 and
+                any(map(str.isalpha, password)) and
+                any(map(str.isdigit, password)))
+
+
+# Static page chrome - rendered with st.html (no Markdown parse per rerun)
+_HEADER_HTML = """
+<div style='text-align: center; padding: 20px;'>
+    <h1>🎯 AI Resume Shortlisting</h1>
+    <p style='color: #666;'>Admin-Approved Access Only</p>
+</div>
+"""
+
+_FOOTER_HTML = """
+<div style='text-align: center; color: #666; font-size: 12px;'>
+    <p>🔐 Secure Access | Admin Approval Required</p>
+    <p>© 2024 AI Resume Shortlisting System</p>
+</div>
+"""
+
+
+def sign_out():
+    """Logout user - clears the session's login and results in one update"""
+    st.session_state.update(user=None, parsed_resumes=[], ranked_candidates=[])
+
+
+@st.cache_resource
+def _get_auth() -> AdminApprovalAuth:
+    """Shared AdminApprovalAuth instance - reused across reruns and sessions"""
+    return AdminApprovalAuth()
 
 
 def render_auth_page():
     """Render authentication page"""
     
-    auth = AdminApprovalAuth()
+    auth = _get_auth()
+    auth.init_session_state()
     
     if auth.is_authenticated():
         st.success(f"✅ Logged in as: {auth.get_current_user()['full_name']}")
         if st.button("Logout"):
-            auth.sign_out()
+            sign_out()
             st.rerun()
         return
     
     col1, col2, col3 = st.columns([1, 2, 1])
     
     with col2:
-        st.markdown("""
-        <div style='text-align: center; padding: 20px;'>
-            <h1>🎯 AI Resume Shortlisting</h1>
-            <p style='color: #666;'>Admin-Approved Access Only</p>
-        </div>
-        """, unsafe_allow_html=True)
+        st.html(_HEADER_HTML)
         
         tab1, tab2 = st.tabs(["🔐 Login", "📝 Request Access"])
         
@@ -349,10 +592,5 @@ def render_auth_page():
                             st.error(message)
         
         st.markdown("---")
-        st.markdown("""
-        <div style='text-align: center; color: #666; font-size: 12px;'>
-            <p>🔐 Secure Access | Admin Approval Required</p>
-            <p>© 2024 AI Resume Shortlisting System</p>
-        </div>
-        """, unsafe_allow_html=True)
+        st.html(_FOOTER_HTML)
 
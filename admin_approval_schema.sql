@@ -0,0 +1,106 @@
+-- =====================================================================
+-- Admin Approval Authentication - Supabase schema
+-- Database objects required by admin_approval_auth.py
+-- Run in the Supabase SQL editor (safe to re-run)
+-- =====================================================================
+
+-- ==================== USERS ====================
+
+-- One account per email, case-insensitively - also for rows created outside
+-- the app (e.g. from the dashboard). This is the only unique index on email:
+-- sign_up inserts directly and relies on it (error 23505) instead of a SELECT
+-- round-trip beforehand, and auth_lookup probes it on lower(email).
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_lower_idx ON users (lower(email));
+
+-- Timestamped by the database: sign_up doesn't send signup_date
+ALTER TABLE users ALTER COLUMN signup_date SET DEFAULT now();
+
+-- Admin review list (pending_users_page below): only unapproved rows are
+-- indexed, in page order, so each page is a short index range scan instead
+-- of a filter over the whole table. id breaks signup_date ties.
+DROP INDEX IF EXISTS users_pending_signup_idx;  -- earlier signup_date-only version
+CREATE INDEX IF NOT EXISTS users_pending_page_idx
+    ON users (signup_date DESC, id DESC) WHERE is_approved = false;
+
+-- ==================== ACTIVITY LOGS ====================
+
+-- Rows are written in batches by ActivityLogWriter without created_at,
+-- so it records the insert time (at most a few seconds after the event)
+ALTER TABLE activity_logs ALTER COLUMN created_at SET DEFAULT now();
+
+-- ==================== LOGIN LOOKUP ====================
+
+-- sign_in's single round-trip: the columns it needs plus the device check,
+-- evaluated in Postgres so approved_devices never leaves the database.
+-- Password verification stays in Python (each scrypt hash has its own salt).
+-- login_recent lets sign_in skip the last_login write for repeat logins.
+-- (DROP first: CREATE OR REPLACE can't change the result columns.)
+DROP FUNCTION IF EXISTS auth_lookup(text, text);
+CREATE FUNCTION auth_lookup(p_email text, p_device text)
+RETURNS TABLE (
+    id users.id%TYPE,
+    email users.email%TYPE,
+    full_name users.full_name%TYPE,
+    password_hash users.password_hash%TYPE,
+    is_approved users.is_approved%TYPE,
+    approved_at users.approved_at%TYPE,
+    device_approved boolean,
+    login_recent boolean
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT u.id, u.email, u.full_name, u.password_hash, u.is_approved, u.approved_at,
+           p_device = ANY(coalesce(u.approved_devices, '{}')),
+           coalesce(u.last_login > now() - interval '1 minute', false)
+    FROM users u
+    WHERE lower(u.email) = lower(p_email)  -- probes users_email_lower_idx
+    LIMIT 1;
+$$;
+
+-- ==================== ADMIN ACTIONS ====================
+
+-- One page of the admin review list, newest first. The cursor is the
+-- (signup_date, id) of the previous page's last row - signup_date alone is
+-- not unique, so rows sharing a timestamp would be skipped.
+-- Usage (SQL editor): SELECT * FROM pending_users_page();
+--   next page:        SELECT * FROM pending_users_page('<signup_date>', <id>);
+CREATE OR REPLACE FUNCTION pending_users_page(
+    p_before_date users.signup_date%TYPE DEFAULT NULL,
+    p_before_id users.id%TYPE DEFAULT NULL,
+    p_limit integer DEFAULT 50
+)
+RETURNS TABLE (
+    id users.id%TYPE,
+    email users.email%TYPE,
+    full_name users.full_name%TYPE,
+    signup_date users.signup_date%TYPE
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT u.id, u.email, u.full_name, u.signup_date
+    FROM users u
+    WHERE u.is_approved = false  -- users_pending_page_idx
+      AND (p_before_date IS NULL
+           OR (u.signup_date, u.id) < (p_before_date, p_before_id))
+    ORDER BY u.signup_date DESC, u.id DESC
+    LIMIT p_limit;
+$$;
+
+-- Admin-only: exposes pending users' emails, so not callable through the public REST API
+REVOKE EXECUTE ON FUNCTION pending_users_page FROM PUBLIC, anon, authenticated;
+
+-- Approve a device in one statement: appends atomically in the database
+-- (no read-modify-write of the array) and is a no-op if already approved.
+-- Usage (SQL editor): SELECT approve_device('user@example.com', '<device id>');
+CREATE OR REPLACE FUNCTION approve_device(p_email text, p_device text)
+RETURNS void
+LANGUAGE sql
+AS $$
+    UPDATE users
+    SET approved_devices = array_append(coalesce(approved_devices, '{}'), p_device)
+    WHERE lower(email) = lower(p_email)
+      AND NOT (p_device = ANY(coalesce(approved_devices, '{}')));
+$$;
+
+-- Admin-only: must not be callable through the public REST API
+REVOKE EXECUTE ON FUNCTION approve_device(text, text) FROM PUBLIC, anon, authenticated;
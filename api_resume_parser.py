@@ -18,6 +18,11 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
+# Fallback parser patterns (_parse_basic), compiled once at import
+_EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_PHONE_RE = re.compile(r'[\+\(]?[1-9][0-9 .\-\(\)]{8,}[0-9]')
+_EXP_RE = re.compile(r'(\d+)\+?\s*(?:years?|yrs?)')
+
 
 class APIResumeParser:
     """Fast resume parser using OpenAI API"""
@@ -193,15 +198,13 @@ Resume:
     def _parse_basic(self, text: str, filename: str) -> Dict[str, Any]:
         """Basic regex-based parsing"""
         
-        # Extract email
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, text)
-        email = emails[0] if emails else ""
+        # Extract email (first match only - no need to scan the whole resume)
+        email_match = _EMAIL_RE.search(text)
+        email = email_match.group() if email_match else ""
         
         # Extract phone
-        phone_pattern = r'[\+\(]?[1-9][0-9 .\-\(\)]{8,}[0-9]'
-        phones = re.findall(phone_pattern, text)
-        phone = phones[0] if phones else ""
+        phone_match = _PHONE_RE.search(text)
+        phone = phone_match.group() if phone_match else ""
         
         # Extract name (first line)
         lines = [l.strip() for l in text.split('\n') if l.strip()]
@@ -220,8 +223,7 @@ Resume:
                 found_skills.append(skill.title())
         
         # Experience
-        exp_pattern = r'(\d+)\+?\s*(?:years?|yrs?)'
-        exp_matches = re.findall(exp_pattern, text.lower())
+        exp_matches = _EXP_RE.findall(text_lower)
         total_exp = max([int(e) for e in exp_matches], default=0)
         
         return {
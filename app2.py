@@ -26,7 +26,7 @@ from generate_question import QuestionGenerator, AnswerEvaluator
 # Try to import authentication (optional)
 try:
     from authentication import (
-        AuthManager, 
+        get_auth_manager, 
         render_auth_page, 
         render_auth_sidebar, 
         require_auth
@@ -34,7 +34,7 @@ try:
     AUTH_AVAILABLE = True
 except ImportError:
     AUTH_AVAILABLE = False
-    AuthManager = None
+    get_auth_manager = None
     render_auth_page = None
     render_auth_sidebar = None
     require_auth = None
@@ -121,7 +121,7 @@ class ResumeShortlistingApp:
         # Initialize authentication (optional - if module is not available, skip it)
         if AUTH_AVAILABLE:
             try:
-                self.auth_manager = AuthManager()
+                self.auth_manager = get_auth_manager()
             except Exception as e:
                 st.warning(f"⚠️ Authentication setup warning: {str(e)}")
                 self.auth_manager = None
@@ -1,21 +1,24 @@
-# """
-# Configuration Helper
-# Handles secrets for both Streamlit Cloud and Hugging Face Spaces
-# """
+"""
+Configuration Helper
+Handles secrets for both Streamlit Cloud and Hugging Face Spaces
+"""
 
-# import os
-# import streamlit as st
+import os
+from functools import lru_cache
 
+import streamlit as st
 
-# def get_secret(key: str, default=None):
-#     """Get secret from environment or Streamlit secrets"""
-#     # Try environment variable first
-#     value = os.getenv(key)
-#     if value:
-#         return value
-    
-#     # Fall back to Streamlit secrets
-#     try:
-#         return st.secrets[key]
-#     except (KeyError, FileNotFoundError):
-#         return default
+
+@lru_cache(maxsize=64)
+def get_secret(key: str, default=None):
+    """Get secret from environment or Streamlit secrets (memoized per process)"""
+    # Try environment variable first
+    value = os.getenv(key)
+    if value:
+        return value
+
+    # Fall back to Streamlit secrets
+    try:
+        return st.secrets[key]
+    except (KeyError, FileNotFoundError):
+        return default
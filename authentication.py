@@ -7,6 +7,7 @@ import streamlit as st
 from supabase import create_client, Client
 import hashlib
 from datetime import datetime
+from functools import wraps
 
 
 def get_supabase_client():
@@ -16,6 +17,26 @@ def get_supabase_client():
     return create_client(url, key)
 
 
+def is_authenticated() -> bool:
+    """Check auth flag in session state - no AuthManager/Supabase client needed"""
+    return st.session_state.get('authenticated', False)
+
+
+def sign_out():
+    """Clear login state from the session - no AuthManager/Supabase client needed"""
+    st.session_state.update(authenticated=False, user_email=None, user_id=None)
+
+
+def get_auth_manager():
+    """This session's AuthManager - built once per browser session and kept in session state
+
+    Not st.cache_resource: the Supabase client holds the signed-in user's GoTrue session.
+    """
+    if 'auth_manager' not in st.session_state:
+        st.session_state.auth_manager = AuthManager()
+    return st.session_state.auth_manager
+
+
 class AuthManager:
     """Manages user authentication"""
     
@@ -100,11 +121,7 @@ class AuthManager:
         """Logout current user"""
         try:
             self.supabase.auth.sign_out()
-            
-            # Clear session state
-            st.session_state.authenticated = False
-            st.session_state.user_email = None
-            st.session_state.user_id = None
+            sign_out()
             
             return True, "Logged out successfully"
         except Exception as e:
@@ -112,7 +129,7 @@ class AuthManager:
     
     def is_authenticated(self):
         """Check if user is authenticated"""
-        return st.session_state.get('authenticated', False)
+        return is_authenticated()
     
     def get_current_user(self):
         """Get current user info"""
@@ -220,7 +237,7 @@ def render_auth_page():
     # Tabs for Login and Signup
     tab1, tab2 = st.tabs(["🔐 Login", "📝 Sign Up"])
     
-    auth_manager = AuthManager()
+    auth_manager = get_auth_manager()
     
     # LOGIN TAB
     with tab1:
@@ -324,33 +341,38 @@ def render_auth_page():
     """, unsafe_allow_html=True)
 
 
+@st.fragment
+def _auth_sidebar_content():
+    """Logged-in panel - a fragment, so the Logout button doesn't rerun the whole page"""
+    st.markdown("---")
+    st.markdown("### 👤 Logged In")
+    
+    user_email = st.session_state.get('user_email', 'Unknown')
+    st.info(f"📧 {user_email}")
+    
+    if st.button("🚪 Logout", use_container_width=True):
+        # Revokes the GoTrue session held by this session's client, then clears state
+        success, message = get_auth_manager().logout()
+        if success:
+            st.rerun()  # full-app rerun: the whole page changes after logout
+        else:
+            st.error(message)
+
+
 def render_auth_sidebar():
     """Render authentication info in sidebar"""
     
-    auth_manager = AuthManager()
-    
-    if auth_manager.is_authenticated():
+    if is_authenticated():
+        # Fragments can't write to st.sidebar themselves, so enter it out here
         with st.sidebar:
-            st.markdown("---")
-            st.markdown("### 👤 Logged In")
-            
-            user_email = st.session_state.get('user_email', 'Unknown')
-            st.info(f"📧 {user_email}")
-            
-            if st.button("🚪 Logout", use_container_width=True):
-                success, message = auth_manager.logout()
-                if success:
-                    st.success(message)
-                    st.rerun()
-                else:
-                    st.error(message)
+            _auth_sidebar_content()
 
 
 def require_auth(func):
     """Decorator to require authentication for a function"""
+    @wraps(func)
     def wrapper(*args, **kwargs):
-        auth_manager = AuthManager()
-        if not auth_manager.is_authenticated():
+        if not is_authenticated():
             st.warning("⚠️ Please login to access this feature")
             render_auth_page()
             return None
@@ -8,9 +8,88 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
+import threading
 import time
 
 
+class SMTPConnectionPool:
+    """Keeps one authenticated SMTP connection open and reuses it across sends"""
+    
+    # Rotate the socket after this many messages (providers throttle long sessions)
+    MAX_MESSAGES_PER_CONNECTION = 100
+    
+    def __init__(self, smtp_server, smtp_port, sender_email, sender_password):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        
+        self._server = None
+        self._sent_on_connection = 0
+        self._lock = threading.Lock()
+    
+    def _connect(self):
+        """Open connection, upgrade to TLS and authenticate"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        try:
+            server.starttls()  # Secure the connection
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()  # don't leak the socket on bad credentials / TLS failure
+            raise
+        
+        self._server = server
+        self._sent_on_connection = 0
+    
+    def _is_alive(self):
+        """Health-check the open connection with NOOP"""
+        try:
+            return self._server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+    
+    def close(self):
+        """Close the pooled connection (if any)"""
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+    
+    def send(self, msg):
+        """Send a message, connecting lazily and reconnecting once on failure"""
+        with self._lock:
+            if self._server is not None and (
+                self._sent_on_connection >= self.MAX_MESSAGES_PER_CONNECTION or not self._is_alive()
+            ):
+                self.close()
+            
+            if self._server is None:
+                self._connect()
+            
+            try:
+                self._server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # Connection dropped between health check and send - retry once
+                self.close()
+                self._connect()
+                self._server.send_message(msg)
+            except (smtplib.SMTPException, OSError):
+                # Refused message or timeout: don't resend (may already be delivered),
+                # and drop the connection in case the SMTP dialogue is out of sync
+                self.close()
+                raise
+            
+            self._sent_on_connection += 1
+
+
+@st.cache_resource
+def _get_smtp_pool(smtp_server, smtp_port, sender_email, sender_password):
+    """Shared SMTP connection pool per sender account"""
+    return SMTPConnectionPool(smtp_server, smtp_port, sender_email, sender_password)
+
+
 class EmailManager:
     """Manages email sending functionality"""
     
@@ -25,6 +104,14 @@ class EmailManager:
             self.company_name = st.secrets.get("COMPANY_NAME", "Our Company")
         except KeyError as e:
             raise ValueError(f"Missing email configuration in secrets: {e}")
+        
+        # Constant for every message from this manager
+        self.from_header = f"{self.sender_name} <{self.sender_email}>"
+        
+        # Reuse one authenticated connection instead of reconnecting per email
+        self.smtp_pool = _get_smtp_pool(
+            self.smtp_server, self.smtp_port, self.sender_email, self.sender_password
+        )
     
     def validate_config(self):
         """Validate email configuration"""
@@ -50,25 +137,20 @@ class EmailManager:
             tuple: (success: bool, message: str)
         """
         try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['From'] = f"{self.sender_name} <{self.sender_email}>"
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            # Attach body parts
+            # Create message - a multipart wrapper is only needed with a plain-text alternative
             if body_text:
-                part1 = MIMEText(body_text, 'plain')
-                msg.attach(part1)
+                msg = MIMEMultipart('alternative')
+                msg.attach(MIMEText(body_text, 'plain'))
+                msg.attach(MIMEText(body_html, 'html'))
+            else:
+                msg = MIMEText(body_html, 'html')
             
-            part2 = MIMEText(body_html, 'html')
-            msg.attach(part2)
+            msg['From'] = self.from_header
+            msg['To'] = to_email
+            msg['Subject'] = subject
             
-            # Connect to SMTP server and send
-            with smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30) as server:
-                server.starttls()  # Secure the connection
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(msg)
+            # Send over the pooled SMTP connection
+            self.smtp_pool.send(msg)
             
             return True, "Email sent successfully"
             